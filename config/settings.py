@@ -8,12 +8,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Discord Rate Limits
-MESSAGE_RATE_LIMIT = 1.0  # 1 message per second to avoid rate limits
 REACTION_RATE_LIMIT = 0.25  # 250ms between reaction updates
+MESSAGE_CHAR_LIMIT = 2000  # Maximum characters in a Discord message
 
 # ASCII Rendering settings
 DISPLAY_WIDTH = int(os.getenv('DISPLAY_WIDTH', '60'))
-DISPLAY_HEIGHT = int(os.getenv('DISPLAY_HEIGHT', '40'))
+DISPLAY_HEIGHT = int(os.getenv('DISPLAY_HEIGHT', '28'))  # 60x28 keeps a frame under MESSAGE_CHAR_LIMIT
 SHADE_CHARS = ' .:-=+*#%@'
 
 # Game settings
@@ -2,6 +2,7 @@ import os
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
+from src.doom.ratelimit import execute_with_retry
 
 # Load environment variables
 load_dotenv()
@@ -27,13 +28,13 @@ class DoomBot(commands.Bot):
     async def start_game(self, ctx):
         """Start a new DOOM game session"""
         if ctx.author.id in self.active_sessions:
-            await ctx.send("You already have an active game session!")
+            await execute_with_retry(ctx.send, "You already have an active game session!")
             return
         
         session = DoomSession(ctx.author.id)
         self.active_sessions[ctx.author.id] = session
         # Initialize game display will be implemented later
-        await ctx.send("Starting DOOM... Get ready!")
+        await execute_with_retry(ctx.send, "Starting DOOM... Get ready!")
 
 bot = DoomBot()
 
@@ -3,15 +3,23 @@ DOOM Engine interface for the Discord bot.
 Handles game state, player actions, and frame generation.
 """
 import os
-import json
+import orjson
+import time
 import pygame
 import numpy as np
 from typing import Tuple, Optional
-from dataclasses import dataclass, asdict
-from datetime import datetime
+from dataclasses import dataclass
 from python_doom import DoomGame, Button, GameVariable
 from PIL import Image
 
+# Button vectors in the order registered in DoomEngine.setup_game(), built once
+_A_FWD = [1, 0, 0, 0, 0, 0]     # MOVE_FORWARD
+_A_BACK = [0, 1, 0, 0, 0, 0]    # MOVE_BACKWARD
+_A_LEFT = [0, 0, 1, 0, 0, 0]    # TURN_LEFT
+_A_RIGHT = [0, 0, 0, 1, 0, 0]   # TURN_RIGHT
+_A_ATTACK = [0, 0, 0, 0, 1, 0]  # ATTACK
+_A_USE = [0, 0, 0, 0, 0, 1]     # USE
+
 @dataclass
 class GameState:
     health: int = 100
@@ -23,7 +31,16 @@ class GameState:
     score: int = 0
 
     def to_dict(self):
-        return asdict(self)
+        # Flat fields only, so skip asdict()'s recursive deepcopy
+        return {
+            'health': self.health,
+            'armor': self.armor,
+            'ammo': self.ammo,
+            'weapon': self.weapon,
+            'position': self.position,
+            'level': self.level,
+            'score': self.score,
+        }
 
     @classmethod
     def from_dict(cls, data):
@@ -35,6 +52,10 @@ class DoomEngine:
         self.wad_path = wad_path or os.path.join('assets', 'doom1.wad')
         self.game_state = GameState()
         self.frame_buffer = None
+        self._last_state = None
+        self._empty_frame = np.zeros((400, 640), dtype=np.uint8)
+        self.save_dir = os.path.join('assets', 'saves')
+        os.makedirs(self.save_dir, exist_ok=True)
         self.initialized = False
         self.game = DoomGame()
         self.setup_game()
@@ -73,24 +94,26 @@ class DoomEngine:
         self.initialized = True
         
     async def update(self, delta_time: float) -> None:
-        """Update game state"""
-        if not self.initialized:
-            await self.initialize()
-            
-        # Update game state from DOOM engine
-        self.game_state.health = self.game.get_game_variable(GameVariable.HEALTH)
-        self.game_state.armor = self.game.get_game_variable(GameVariable.ARMOR)
-        self.game_state.ammo = self.game.get_game_variable(GameVariable.AMMO)
-        self.game_state.weapon = self.game.get_game_variable(GameVariable.WEAPON)
+        """Update game state (initialize() must have been awaited first)"""
+        assert self.initialized, "DoomEngine.initialize() must be awaited first"
+        
+        # Read variables and frame from a single state snapshot
+        state = self.game.get_state()
+        if state is None:
+            return  # Episode finished; keep the last known state
+        self._last_state = state
+        
+        # Variables arrive in the order registered in setup_game()
+        (self.game_state.health, self.game_state.armor,
+         self.game_state.ammo, self.game_state.weapon) = state.game_variables[:4]
         
         # Get the current frame
-        self.frame_buffer = self.game.get_state().screen_buffer
+        self.frame_buffer = state.screen_buffer
         
     async def handle_input(self, action: str) -> None:
-        """Handle player input"""
-        if not self.initialized:
-            await self.initialize()
-            
+        """Handle player input (initialize() must have been awaited first)"""
+        assert self.initialized, "DoomEngine.initialize() must be awaited first"
+        
         actions = {
             'forward': self._move_forward,
             'backward': self._move_backward,
@@ -106,24 +129,32 @@ class DoomEngine:
             
     async def get_frame(self) -> np.ndarray:
         """Get current frame as numpy array"""
-        if not self.initialized:
-            await self.initialize()
-        return self.frame_buffer if self.frame_buffer is not None else np.zeros((400, 640), dtype=np.uint8)
+        return self.frame_buffer if self.frame_buffer is not None else self._empty_frame
+        
+    def get_state_dict(self) -> dict:
+        """Current game state as a dict, without touching disk"""
+        return self.game_state.to_dict()
         
     async def save_state(self) -> dict:
         """Save current game state"""
-        state_data = self.game_state.to_dict()
+        state_data = self.get_state_dict()
         
-        # Save to file with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        save_path = os.path.join('assets', 'saves', f'save_{self.game_state.level}_{timestamp}.json')
+        # Save to file with a nanosecond timestamp for uniqueness
+        save_path = os.path.join(self.save_dir, f'save_{self.game_state.level}_{time.time_ns()}.json')
         
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        with open(save_path, 'w') as f:
-            json.dump(state_data, f)
+        # Encode in one go and hand the file a single buffer
+        with open(save_path, 'wb') as f:
+            f.write(orjson.dumps(state_data, option=orjson.OPT_SERIALIZE_NUMPY))
             
         return state_data
         
+    async def load_save_file(self, save_path: str) -> dict:
+        """Load game state from a file written by save_state"""
+        with open(save_path, 'rb') as f:
+            state_data = orjson.loads(f.read())
+        await self.load_state(state_data)
+        return state_data
+        
     async def load_state(self, state: dict) -> None:
         """Load saved game state"""
         self.game_state = GameState.from_dict(state)
@@ -132,34 +163,28 @@ class DoomEngine:
     # Private movement methods
     async def _move_forward(self):
         """Move player forward"""
-        action = [1, 0, 0, 0, 0, 0]  # MOVE_FORWARD
-        reward = self.game.make_action(action)
+        reward = self.game.make_action(_A_FWD)
         
     async def _move_backward(self):
         """Move player backward"""
-        action = [0, 1, 0, 0, 0, 0]  # MOVE_BACKWARD
-        reward = self.game.make_action(action)
+        reward = self.game.make_action(_A_BACK)
         
     async def _turn_left(self):
         """Turn player left"""
-        action = [0, 0, 1, 0, 0, 0]  # TURN_LEFT
-        reward = self.game.make_action(action)
+        reward = self.game.make_action(_A_LEFT)
         
     async def _turn_right(self):
         """Turn player right"""
-        action = [0, 0, 0, 1, 0, 0]  # TURN_RIGHT
-        reward = self.game.make_action(action)
+        reward = self.game.make_action(_A_RIGHT)
         
     async def _shoot(self):
         """Fire current weapon"""
         if self.game_state.ammo > 0:
-            action = [0, 0, 0, 0, 1, 0]  # ATTACK
-            reward = self.game.make_action(action)
+            reward = self.game.make_action(_A_ATTACK)
         
     async def _use(self):
         """Use/interact with object in front of player"""
-        action = [0, 0, 0, 0, 0, 1]  # USE
-        reward = self.game.make_action(action)
+        reward = self.game.make_action(_A_USE)
         
     async def _switch_weapon(self):
         """Switch to next available weapon"""
@@ -2,77 +2,137 @@
 Frame buffer handler for converting DOOM frames to ASCII art
 """
 import numpy as np
-from PIL import Image
 from typing import List, Tuple
 
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; fall back to the NumPy path
+    njit = None
+
+def _render(frame, row_idx, col_idx, shade_lut, out):
+    """Fused downsample + shade lookup writing newline-terminated rows into out"""
+    height = row_idx.shape[0]
+    width = col_idx.shape[0]
+    for r in range(height):
+        base = r * (width + 1)
+        src_row = frame[row_idx[r]]
+        for c in range(width):
+            out[base + c] = shade_lut[src_row[col_idx[c]]]
+        out[base + width] = 10  # '\n'
+    return out
+
+if njit is not None:
+    _render = njit(cache=True, fastmath=True, nogil=True)(_render)
+
 class FrameBuffer:
     # ASCII characters from darkest to lightest
     ASCII_CHARS = ' .:-=+*#%@'
+    # Weapon names indexed by DOOM weapon slot
+    _WEAPONS = ("Unknown", "Fist", "Pistol", "Shotgun",
+                "Chaingun", "Rocket", "Plasma", "BFG9000")
+    # Segments in the health bar
+    _BAR_LENGTH = 10
     
-    def __init__(self, width: int = 60, height: int = 40):
+    def __init__(self, width: int = 60, height: int = 40,
+                 source_width: int = 640, source_height: int = 400):
         self.width = width
         self.height = height
+        # Nearest-neighbour sample positions for the fixed engine resolution
+        self._source_shape = (source_height, source_width)
+        self._sample_indices(source_height, source_width)
+        # 256-entry table mapping 8-bit intensity directly to its shade character,
+        # matching the original int(p / 255 * (levels - 1)) quantization exactly
+        levels = len(self.ASCII_CHARS)
+        self._shade_lut = np.array(
+            [ord(self.ASCII_CHARS[min(i * (levels - 1) // 255, levels - 1)]) for i in range(256)],
+            dtype=np.uint8
+        )
+        # Persistent work buffer, overwritten in place on every frame
+        self._small = np.empty((height, width), dtype=np.uint8)
+        # Output buffer: one row of characters plus a newline per line
+        self._out = np.empty(height * (width + 1), dtype=np.uint8)
+        self._out_2d = self._out.reshape(height, width + 1)
+        self._out_2d[:, width] = ord('\n')
+        # Frame borders never change, so build them once
+        self._border_top = '╔' + '═' * width + '╗\n'
+        self._border_bottom = '╚' + '═' * width + '╝\n'
+        # Every possible health bar, indexed by number of filled segments
+        self._health_bars = tuple(
+            '█' * filled + '░' * (self._BAR_LENGTH - filled)
+            for filled in range(self._BAR_LENGTH + 1)
+        )
         
     def frame_to_ascii(self, frame: np.ndarray) -> str:
         """Convert a frame buffer to ASCII art"""
-        # Resize the frame to our target dimensions
-        image = Image.fromarray(frame)
-        image = image.resize((self.width, self.height))
-        
-        # Convert to grayscale if not already
-        if image.mode != 'L':
-            image = image.convert('L')
+        # Collapse colour frames to grayscale
+        if frame.ndim == 3:
+            frame = frame.mean(axis=2).astype(np.uint8)
             
-        # Convert to numpy array
-        pixels = np.array(image)
+        if frame.shape != self._source_shape:
+            self._source_shape = frame.shape
+            self._sample_indices(*frame.shape)
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+            
+        if njit is not None:
+            _render(frame, self._row_idx, self._col_idx, self._shade_lut, self._out)
+            return self._out[:-1].tobytes().decode('ascii')
+            
+        # Downsample to our target dimensions with a single gather
+        np.take(frame.ravel(), self._flat_idx, out=self._small, mode='clip')
+        
+        # Map every intensity to its shade character. The output slice skips the
+        # newline column, so NumPy writes through a temporary and copies it back.
+        np.take(self._shade_lut, self._small, out=self._out_2d[:, :self.width], mode='clip')
         
-        # Normalize pixel values to ASCII character range
-        normalized = (pixels / 255.0 * (len(self.ASCII_CHARS) - 1)).astype(int)
+        # Rows are already newline-terminated in the output buffer
+        return self._out[:-1].tobytes().decode('ascii')
         
-        # Convert to ASCII
-        ascii_rows = []
-        for row in normalized:
-            ascii_row = ''.join(self.ASCII_CHARS[pixel] for pixel in row)
-            ascii_rows.append(ascii_row)
+    def frames_to_ascii(self, frames: np.ndarray) -> List[str]:
+        """Convert a stack of frames shaped (N, height, width) to ASCII art in one pass"""
+        # Collapse colour frames to grayscale
+        if frames.ndim == 4:
+            frames = frames.mean(axis=3).astype(np.uint8)
             
-        return '\n'.join(ascii_rows)
+        frames = np.ascontiguousarray(frames, dtype=np.uint8)
+        if frames.shape[1:] != self._source_shape:
+            self._source_shape = frames.shape[1:]
+            self._sample_indices(*frames.shape[1:])
+            
+        # One gather and one lookup across the whole batch
+        small = frames[:, self._row_idx[:, None], self._col_idx[None, :]]
+        out = np.empty((len(frames), self.height, self.width + 1), dtype=np.uint8)
+        np.take(self._shade_lut, small, out=out[:, :, :self.width], mode='clip')
+        out[:, :, self.width] = ord('\n')
+        
+        # Slice each frame back out, dropping its trailing newline
+        block = out.tobytes()
+        size = self.height * (self.width + 1)
+        return [block[i * size:(i + 1) * size - 1].decode('ascii') for i in range(len(frames))]
+        
+    def _sample_indices(self, source_height: int, source_width: int) -> None:
+        """Precompute row/column indices for downsampling a source frame"""
+        self._row_idx = np.arange(self.height) * source_height // self.height
+        self._col_idx = np.arange(self.width) * source_width // self.width
+        self._flat_idx = self._row_idx[:, None] * source_width + self._col_idx[None, :]
         
     def add_status_bar(self, ascii_frame: str, health: int, ammo: int, 
                       armor: int = 0, weapon: int = 2) -> str:
         """Add status bar to the ASCII frame"""
         # Create health bar
-        health_bar = self._create_bar(health, 100, 10)
+        filled = min(max(int(health / 100 * self._BAR_LENGTH), 0), self._BAR_LENGTH)
+        health_bar = self._health_bars[filled]
         ammo_text = f"Ammo: {ammo}"
         armor_text = f"Armor: {armor}"
-        weapon_text = f"Weapon: {self._weapon_name(weapon)}"
+        
+        # Engine reports game variables as floats
+        weapon_id = int(weapon)
+        weapon_name = self._WEAPONS[weapon_id] if 0 <= weapon_id < len(self._WEAPONS) else "Unknown"
+        weapon_text = f"Weapon: {weapon_name}"
         
         # Create status bar
         status_line = f"Health: [{health_bar}] {health}% | {ammo_text} | {armor_text} | {weapon_text}"
         
-        # Add border and status
-        width = max(len(line) for line in ascii_frame.split('\n'))
-        border_top = '╔' + '═' * width + '╗\n'
-        border_bottom = '╚' + '═' * width + '╝\n'
-        
-        # Center status line
-        status_line = status_line.center(width)
-        
-        return f"{border_top}{ascii_frame}\n{border_bottom}{status_line}"
-        
-    def _create_bar(self, value: int, max_value: int, length: int) -> str:
-        """Create a visual bar representation"""
-        filled = int((value / max_value) * length)
-        return '█' * filled + '░' * (length - filled)
+        # Center status line under the frame
+        status_line = status_line.center(self.width)
         
-    def _weapon_name(self, weapon_id: int) -> str:
-        """Convert weapon ID to name"""
-        weapons = {
-            1: "Fist",
-            2: "Pistol",
-            3: "Shotgun",
-            4: "Chaingun",
-            5: "Rocket",
-            6: "Plasma",
-            7: "BFG9000"
-        }
-        return weapons.get(weapon_id, "Unknown")
+        return f"{self._border_top}{ascii_frame}\n{self._border_bottom}{status_line}"
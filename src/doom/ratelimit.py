@@ -0,0 +1,22 @@
+"""
+Retry helpers for Discord API calls that hit rate limits
+"""
+import asyncio
+import random
+
+async def execute_with_retry(coro_fn, *args, max_attempts: int = 3, **kwargs):
+    """Await coro_fn(*args, **kwargs) up to max_attempts times, backing off exponentially on 429"""
+    for attempt in range(max_attempts):
+        try:
+            return await coro_fn(*args, **kwargs)
+        except Exception as e:
+            # discord.HTTPException carries the HTTP status and aiohttp response
+            if getattr(e, 'status', None) != 429 or attempt == max_attempts - 1:
+                raise
+
+            # Honour Discord's Retry-After, doubling it on each further attempt
+            retry_after = 1.0
+            response = getattr(e, 'response', None)
+            if response is not None:
+                retry_after = float(response.headers.get('Retry-After', retry_after))
+            await asyncio.sleep(2 ** attempt * retry_after + random.random() * 0.3)
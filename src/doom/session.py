@@ -2,61 +2,142 @@
 Game session manager for handling individual player sessions
 """
 import time
+import heapq
+import itertools
+import logging
 import asyncio
-from typing import Dict, Optional
+import numpy as np
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 from .engine import DoomEngine
 from .frame_buffer import FrameBuffer
+from .ratelimit import execute_with_retry
 from config.settings import (
     UPDATE_RATE,
-    MESSAGE_RATE_LIMIT,
     REACTION_RATE_LIMIT,
-    MAX_UPDATES_PER_MINUTE
+    MESSAGE_CHAR_LIMIT,
+    DISPLAY_WIDTH,
+    DISPLAY_HEIGHT,
+    MAX_UPDATES_PER_MINUTE,
+    MAX_SESSIONS
 )
 
+logger = logging.getLogger(__name__)
+
+# Assumed limits for routes Discord hasn't reported on yet (message edits allow ~5 per 5s)
+ROUTE_BUCKET_CAPACITY = 5
+ROUTE_BUCKET_RATE = 1.0
+
 class RateLimiter:
-    def __init__(self):
-        self.last_update = 0
-        self.update_count = 0
-        self.last_minute = 0
+    """Token bucket allowing MAX_UPDATES_PER_MINUTE, refilled continuously"""
+    def __init__(self, capacity: float = MAX_UPDATES_PER_MINUTE,
+                 rate: float = MAX_UPDATES_PER_MINUTE / 60.0):
+        self.capacity = capacity
+        self.rate = rate  # tokens per second
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self.reset_at: Optional[float] = None  # End of a Discord-reported window
+        
+    def _refill(self, now: float) -> None:
+        if self.reset_at is not None:
+            # Discord windows are fixed: nothing refills until the window resets
+            if now >= self.reset_at:
+                self.tokens = float(self.capacity)
+                self.reset_at = None
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
         
     def can_update(self) -> bool:
-        current_time = time.time()
+        """Consume a token if one is available"""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+        
+    def time_until_available(self) -> float:
+        """Seconds until the next token can be consumed"""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            return 0.0
+        if self.reset_at is not None:
+            return self.reset_at - self.last
+        return (1 - self.tokens) / self.rate
+        
+    def sync(self, limit: int, remaining: int, reset_after: float) -> None:
+        """Align the bucket with the fixed window reported by Discord"""
+        now = time.monotonic()
+        self.capacity = limit
+        self.tokens = float(remaining)
+        self.reset_at = now + reset_after
+        self.last = now
+
+class BucketRegistry:
+    """Per-route rate limit buckets keyed by Discord's X-RateLimit-Bucket id"""
+    def __init__(self):
+        self.buckets: Dict[str, RateLimiter] = {}
+        self.route_to_bucket: Dict[Tuple, str] = {}
         
-        # Reset counter every minute
-        current_minute = int(current_time / 60)
-        if current_minute > self.last_minute:
-            self.update_count = 0
-            self.last_minute = current_minute
+    def _bucket_for(self, route: Tuple) -> RateLimiter:
+        # Until Discord tells us the bucket id, the route itself is the key
+        key = self.route_to_bucket.get(route, repr(route))
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = RateLimiter(ROUTE_BUCKET_CAPACITY, ROUTE_BUCKET_RATE)
+        return bucket
+        
+    async def acquire(self, route: Tuple) -> None:
+        """Wait until a request on this route is allowed"""
+        bucket = self._bucket_for(route)
+        while not bucket.can_update():
+            await asyncio.sleep(bucket.time_until_available())
             
-        # Check rate limits
-        if self.update_count >= MAX_UPDATES_PER_MINUTE:
-            return False
+    def update(self, route: Tuple, headers: Mapping[str, str]) -> None:
+        """Record rate limit headers from a Discord response for this route"""
+        bucket_id = headers.get('X-RateLimit-Bucket')
+        if bucket_id is None:
+            return
             
-        if current_time - self.last_update < MESSAGE_RATE_LIMIT:
-            return False
+        self.route_to_bucket[route] = bucket_id
+        bucket = self.buckets.get(bucket_id)
+        if bucket is None:
+            # Carry the route's remaining tokens over so learning the id can't allow a burst
+            bucket = self.buckets.pop(repr(route), None)
+            if bucket is None:
+                bucket = RateLimiter(ROUTE_BUCKET_CAPACITY, ROUTE_BUCKET_RATE)
+            self.buckets[bucket_id] = bucket
             
-        return True
-        
-    def record_update(self):
-        self.last_update = time.time()
-        self.update_count += 1
+        limit = headers.get('X-RateLimit-Limit')
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        if limit is not None and remaining is not None and reset_after is not None:
+            bucket.sync(int(limit), int(remaining), float(reset_after))
 
 class GameSession:
-    def __init__(self, user_id: int):
+    def __init__(self, user_id: int, registry: Optional[BucketRegistry] = None,
+                 executor: Optional[Executor] = None,
+                 retry: Optional[Callable[..., Awaitable]] = None):
         self.user_id = user_id
+        self.registry = registry or BucketRegistry()
+        self.executor = executor  # None uses the loop's default executor
+        self.retry = retry or execute_with_retry
         self.engine = DoomEngine()
-        self.frame_buffer = FrameBuffer()
+        self.frame_buffer = FrameBuffer(DISPLAY_WIDTH, DISPLAY_HEIGHT)
         self.message_id: Optional[int] = None
         self.channel_id: Optional[int] = None
         self.last_update: float = 0
         self.active = False
         self.rate_limiter = RateLimiter()
         self.last_input_time = 0
+        self._last_hash: Optional[int] = None
+        self._render_lock = asyncio.Lock()
         
     async def start(self) -> None:
         """Start the game session"""
         await self.engine.initialize()
         self.active = True
+        self.last_update = time.time()
         
     async def stop(self) -> None:
         """Stop the game session"""
@@ -84,7 +165,7 @@ class GameSession:
             return  # Skip update if rate limited
             
         await self.engine.update(delta_time)
-        self.rate_limiter.record_update()
+        self.last_update = time.time()
         
     async def get_frame(self) -> str:
         """Get current frame as ASCII art"""
@@ -94,11 +175,19 @@ class GameSession:
         # Get the raw frame from the engine
         frame = await self.engine.get_frame()
         
-        # Convert to ASCII
-        ascii_frame = self.frame_buffer.frame_to_ascii(frame)
+        # Convert to ASCII off the event loop so the gateway heartbeat keeps running.
+        # The lock keeps overlapping calls from sharing the FrameBuffer's work buffers.
+        loop = asyncio.get_running_loop()
+        async with self._render_lock:
+            ascii_frame = await loop.run_in_executor(
+                self.executor, self.frame_buffer.frame_to_ascii, frame
+            )
+        
+        return self.compose_frame(ascii_frame)
         
-        # Add status bar
-        game_state = await self.engine.save_state()
+    def compose_frame(self, ascii_frame: str) -> str:
+        """Add the status bar for the current game state to an ASCII frame"""
+        game_state = self.engine.get_state_dict()
         return self.frame_buffer.add_status_bar(
             ascii_frame,
             game_state['health'],
@@ -107,6 +196,42 @@ class GameSession:
             game_state['weapon']
         )
         
+    @property
+    def route(self) -> Tuple:
+        """Rate limit route for editing this session's message"""
+        return ('PATCH', '/channels/{channel_id}/messages/{message_id}', self.channel_id)
+        
+    async def send_frame(self, message, frame: Optional[str] = None) -> None:
+        """Edit the session's Discord message with frame, rendering it if not given"""
+        if frame is None:
+            frame = await self.get_frame()
+        
+        # Skip the edit entirely when nothing on screen changed
+        frame_hash = hash(frame)
+        if frame_hash == self._last_hash:
+            return
+            
+        content = f"```\n{frame}\n```"
+        if len(content) > MESSAGE_CHAR_LIMIT:
+            raise ValueError(
+                f"Frame is {len(content)} characters, over Discord's {MESSAGE_CHAR_LIMIT} limit"
+            )
+            
+        await self.retry(self._edit_message, message, content)
+        self._last_hash = frame_hash
+        
+    async def _edit_message(self, message, content: str) -> None:
+        """Edit message, feeding rate limit headers from failed responses to the registry"""
+        # Acquire on every attempt so retries are paced by the route's bucket too
+        await self.registry.acquire(self.route)
+        try:
+            await message.edit(content=content)
+        except Exception as e:
+            headers = getattr(getattr(e, 'response', None), 'headers', None)
+            if headers is not None:
+                self.registry.update(self.route, headers)
+            raise
+        
     async def save_state(self) -> dict:
         """Save current game state"""
         return await self.engine.save_state()
@@ -116,18 +241,29 @@ class GameSession:
         await self.engine.load_state(state)
 
 class SessionManager:
-    def __init__(self):
+    def __init__(self, retry: Optional[Callable[..., Awaitable]] = None):
         self.sessions: Dict[int, GameSession] = {}
+        self.retry = retry
+        self.registry = BucketRegistry()
+        self.executor = ThreadPoolExecutor(max_workers=MAX_SESSIONS)
+        self.frame_buffer = FrameBuffer(DISPLAY_WIDTH, DISPLAY_HEIGHT)  # Shared batch renderer
         self.last_cleanup = 0
+        # Min-heap of (last_update, user_id, generation); entries are re-checked lazily
+        # on cleanup. Only the entry matching a user's current generation is live.
+        self._activity: List[Tuple[float, int, int]] = []
+        self._generations: Dict[int, int] = {}
+        self._next_generation = itertools.count()
         
     async def create_session(self, user_id: int) -> GameSession:
         """Create a new game session for user"""
         if user_id in self.sessions:
             await self.sessions[user_id].stop()
             
-        session = GameSession(user_id)
+        session = GameSession(user_id, self.registry, self.executor, self.retry)
         await session.start()
         self.sessions[user_id] = session
+        generation = self._generations[user_id] = next(self._next_generation)
+        heapq.heappush(self._activity, (session.last_update, user_id, generation))
         return session
         
     async def get_session(self, user_id: int) -> Optional[GameSession]:
@@ -139,7 +275,15 @@ class SessionManager:
         if user_id in self.sessions:
             await self.sessions[user_id].stop()
             del self.sessions[user_id]
+            self._generations.pop(user_id, None)
             
+    async def close(self) -> None:
+        """End all sessions and shut down the render thread pool"""
+        for user_id in tuple(self.sessions):
+            await self.end_session(user_id)
+        # Wait for in-flight renders without blocking the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+        
     async def update_all(self, delta_time: float) -> None:
         """Update all active sessions with rate limiting"""
         current_time = time.time()
@@ -147,14 +291,76 @@ class SessionManager:
         # Cleanup inactive sessions every minute
         if current_time - self.last_cleanup >= 60:
             self.last_cleanup = current_time
-            inactive_users = [
-                user_id for user_id, session in self.sessions.items()
-                if current_time - session.last_update > 300  # 5 minutes timeout
-            ]
-            for user_id in inactive_users:
+            for user_id in self._expired_users(current_time - 300):  # 5 minutes timeout
                 await self.end_session(user_id)
         
-        # Update active sessions
-        for session in self.sessions.values():
-            await session.update(delta_time)
-            await asyncio.sleep(MESSAGE_RATE_LIMIT)  # Ensure rate limit compliance
+        # Snapshot once so end_session() can't mutate the dict mid-iteration
+        sessions = tuple(self.sessions.values())
+        
+        # Update active sessions concurrently; each is paced by its own limiter
+        results = await asyncio.gather(
+            *(session.update(delta_time) for session in sessions),
+            return_exceptions=True
+        )
+        self._log_failures("Update", sessions, results)
+            
+        # Wait once until the earliest session can update again
+        delay = min(
+            (session.rate_limiter.time_until_available() for session in sessions),
+            default=0.0
+        )
+        if delay > 0:
+            await asyncio.sleep(delay)
+            
+    async def render_all(self) -> Dict[int, str]:
+        """Render every active session's frame as ASCII in a single batch"""
+        active = [session for session in self.sessions.values() if session.active]
+        if not active:
+            return {}
+            
+        frames = np.stack([await session.engine.get_frame() for session in active], axis=0)
+        loop = asyncio.get_running_loop()
+        ascii_frames = await loop.run_in_executor(
+            self.executor, self.frame_buffer.frames_to_ascii, frames
+        )
+        return {
+            session.user_id: session.compose_frame(ascii_frame)
+            for session, ascii_frame in zip(active, ascii_frames)
+        }
+        
+    async def send_frames(self, messages: Mapping[int, Any]) -> None:
+        """Render all sessions in one batch and edit each user's message in messages"""
+        frames = await self.render_all()
+        targets = [
+            (session, frames[user_id])
+            for user_id, session in self.sessions.items()
+            if user_id in frames and user_id in messages
+        ]
+        results = await asyncio.gather(
+            *(session.send_frame(messages[session.user_id], frame) for session, frame in targets),
+            return_exceptions=True
+        )
+        self._log_failures("Frame send", (session for session, _ in targets), results)
+        
+    @staticmethod
+    def _log_failures(action: str, sessions: Iterable[GameSession], results: List) -> None:
+        """Log exceptions returned by gather(return_exceptions=True), re-raising cancellation"""
+        for session, result in zip(sessions, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, BaseException):
+                logger.error("%s failed for session %s", action, session.user_id, exc_info=result)
+                
+    def _expired_users(self, cutoff: float) -> List[int]:
+        """Pop users whose sessions have not updated since cutoff"""
+        expired = []
+        while self._activity and self._activity[0][0] < cutoff:
+            _, user_id, generation = heapq.heappop(self._activity)
+            session = self.sessions.get(user_id)
+            if session is None or self._generations.get(user_id) != generation:
+                continue  # Stale entry for an ended or replaced session
+            if session.last_update < cutoff:
+                expired.append(user_id)
+            else:
+                heapq.heappush(self._activity, (session.last_update, user_id, generation))
+        return expired
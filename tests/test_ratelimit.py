@@ -0,0 +1,59 @@
+"""
+Tests for the Discord retry helper in src.doom.ratelimit
+"""
+import asyncio
+import pytest
+from src.doom import ratelimit
+from src.doom.ratelimit import execute_with_retry
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+class FakeHTTPException(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(status)
+        self.status = status
+        self.response = FakeResponse(headers or {})
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(ratelimit.asyncio, 'sleep', fake_sleep)
+    monkeypatch.setattr(ratelimit.random, 'random', lambda: 0.0)
+    return delays
+
+def test_retries_429_with_backoff(sleeps):
+    calls = []
+
+    async def edit():
+        calls.append(1)
+        if len(calls) < 3:
+            raise FakeHTTPException(429, {'Retry-After': '0.5'})
+        return 'ok'
+
+    assert asyncio.run(execute_with_retry(edit)) == 'ok'
+    assert sleeps == [0.5, 1.0]
+
+def test_max_attempts_is_total_calls(sleeps):
+    calls = []
+
+    async def edit():
+        calls.append(1)
+        raise FakeHTTPException(429)
+
+    with pytest.raises(FakeHTTPException):
+        asyncio.run(execute_with_retry(edit, max_attempts=3))
+    assert len(calls) == 3
+
+def test_other_errors_are_not_retried(sleeps):
+    async def edit():
+        raise FakeHTTPException(400)
+
+    with pytest.raises(FakeHTTPException):
+        asyncio.run(execute_with_retry(edit))
+    assert sleeps == []
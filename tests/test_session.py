@@ -0,0 +1,127 @@
+"""
+Tests for the rate limiting helpers in src.doom.session
+"""
+import asyncio
+import pytest
+from src.doom import session
+from src.doom.session import (
+    BucketRegistry,
+    RateLimiter,
+    ROUTE_BUCKET_CAPACITY,
+)
+
+ROUTE = ('PATCH', '/channels/{channel_id}/messages/{message_id}', 1)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(session.time, 'monotonic', fake.monotonic)
+    monkeypatch.setattr(session.asyncio, 'sleep', fake.sleep)
+    return fake
+
+def headers(bucket='abc', limit=5, remaining=4, reset_after=5.0):
+    return {
+        'X-RateLimit-Bucket': bucket,
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset-After': str(reset_after),
+    }
+
+def test_rate_limiter_refills_continuously(clock):
+    limiter = RateLimiter(capacity=2, rate=1.0)
+    assert limiter.can_update()
+    assert limiter.can_update()
+    assert not limiter.can_update()
+    assert limiter.time_until_available() == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert limiter.can_update()
+
+def test_sync_holds_tokens_until_window_resets(clock):
+    limiter = RateLimiter(capacity=60, rate=1.0)
+    limiter.sync(limit=5, remaining=0, reset_after=0.2)
+    assert not limiter.can_update()
+    assert limiter.time_until_available() == pytest.approx(0.2)
+
+    # A short Reset-After must not turn into a fast continuous refill
+    clock.now += 0.1
+    assert not limiter.can_update()
+
+    clock.now += 0.1
+    for _ in range(5):
+        assert limiter.can_update()
+    assert not limiter.can_update()
+
+def test_unknown_route_uses_conservative_bucket(clock):
+    registry = BucketRegistry()
+
+    async def burst():
+        for _ in range(ROUTE_BUCKET_CAPACITY + 1):
+            await registry.acquire(ROUTE)
+
+    asyncio.run(burst())
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+def test_update_moves_route_tokens_to_bucket_id(clock):
+    registry = BucketRegistry()
+    route_bucket = registry._bucket_for(ROUTE)
+    route_bucket.can_update()
+
+    registry.update(ROUTE, {'X-RateLimit-Bucket': 'abc'})
+    assert registry.route_to_bucket[ROUTE] == 'abc'
+    assert registry.buckets['abc'] is route_bucket
+    assert route_bucket.tokens == ROUTE_BUCKET_CAPACITY - 1
+
+def test_acquire_waits_for_reported_reset(clock):
+    registry = BucketRegistry()
+    registry.update(ROUTE, headers(remaining=0, reset_after=2.5))
+
+    asyncio.run(registry.acquire(ROUTE))
+    assert clock.sleeps == [pytest.approx(2.5)]
+
+def test_update_ignores_responses_without_bucket(clock):
+    registry = BucketRegistry()
+    registry.update(ROUTE, {'X-RateLimit-Remaining': '0'})
+    assert registry.route_to_bucket == {}
+
+class FakeSession:
+    def __init__(self, user_id, *args):
+        self.user_id = user_id
+        self.last_update = 0.0
+
+    async def start(self):
+        self.last_update = session.time.time()
+
+    async def stop(self):
+        pass
+
+def test_recreated_sessions_keep_one_heap_entry(monkeypatch):
+    monkeypatch.setattr(session, 'GameSession', FakeSession)
+    manager = session.SessionManager()
+
+    async def recreate():
+        for _ in range(3):
+            await manager.create_session(42)
+
+    asyncio.run(recreate())
+    live = manager.sessions[42]
+    live.last_update = session.time.time() + 100
+
+    # Stale entries are dropped; only the live one is pushed back
+    assert manager._expired_users(session.time.time() + 50) == []
+    assert len(manager._activity) == 1
+
+    asyncio.run(manager.close())
+    assert manager.sessions == {}